@@ -1,101 +1,592 @@
-import requests
+import aiohttp
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import heapq
 import json
-import xml.etree.ElementTree as ET
+import multiprocessing
+import queue
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import signal
 from tqdm import tqdm
 import os
+import shelve
 import threading
-from typing import Any, List, Optional, Set
+from typing import Iterable, List, Optional, Set
 
 # Global event to signal shutdown
 shutdown_event = threading.Event()
 
-# Global session for connection pooling
-session = requests.Session()
-
-# Regular expression to find proxies in IP:PORT format, with improved IP validation
-PROXY_REGEX = re.compile(r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?):\d{1,5}\b')
+# Single shared dedup set for every proxy found. All updates happen on the
+# event-loop thread, so no lock is needed; workers feed matches straight into
+# it rather than hashing each proxy again through intermediate collections.
+all_proxies: Set[bytes] = set()
+
+# Optional persistent Bloom filter of proxies recorded by previous runs, at
+# roughly a byte per element instead of a stored string. Known proxies are
+# discarded before they are hashed into the big dedup set, so repeat runs
+# only process what is new; the output file still accumulates everything,
+# since the merge step folds the previous output back in (see
+# _merge_batches). The ~1% false-positive rate means a genuinely new proxy
+# is occasionally skipped, which mirrored proxy lists can tolerate. It is
+# optional; without pybloom_live every run re-collects everything it finds.
+BLOOM_FILE = 'seen.bloom'
+BLOOM_ERROR_RATE = 0.01
+try:
+    from pybloom_live import ScalableBloomFilter
+except ImportError:
+    ScalableBloomFilter = None
+
+seen_bloom = None
+if ScalableBloomFilter is not None:
+    if os.path.exists(BLOOM_FILE):
+        try:
+            with open(BLOOM_FILE, 'rb') as f:
+                seen_bloom = ScalableBloomFilter.fromfile(f)
+        except (OSError, ValueError):
+            seen_bloom = None  # Corrupt filter; start a fresh one.
+    if seen_bloom is None:
+        seen_bloom = ScalableBloomFilter(error_rate=BLOOM_ERROR_RATE)
+
+def _new_proxies(proxies: Iterable[bytes]) -> Iterable[bytes]:
+    """Drops proxies already recorded by previous runs, recording the rest."""
+    if seen_bloom is None:
+        return proxies
+    # ScalableBloomFilter.add returns True when the element was present.
+    return (proxy for proxy in proxies if not seen_bloom.add(proxy))
+
+# Background writer: newly unique proxies go onto a bounded queue, and a
+# thread drains it into sorted batch files as the run progresses; shutdown
+# k-way merges the batches into the final output. The expensive sort-and-write
+# work leaves the hot path, and no run ever materializes the whole collection
+# a second time for sorting.
+WRITER_BATCH_SIZE = 1 << 20  # proxies per sorted batch file
+write_queue: queue.Queue = queue.Queue(maxsize=100_000)
+_batch_files: List[str] = []
+
+def _record_proxies(proxies: Iterable[bytes]) -> None:
+    """Feeds proxies through the dedup set, handing new ones to the writer."""
+    for proxy in proxies:
+        if proxy not in all_proxies:
+            all_proxies.add(proxy)
+            write_queue.put(proxy)
+
+def _flush_batch(batch: List[bytes]) -> None:
+    """Sorts one batch and writes it out as a numbered temp file."""
+    batch.sort()
+    path = f'proxies_batch_{len(_batch_files)}.tmp'
+    with open(path, 'wb') as f:
+        f.write(b'\n'.join(batch) + b'\n')
+    _batch_files.append(path)
+
+def writer_loop() -> None:
+    """Drains the write queue into sorted batches until the None sentinel."""
+    batch: List[bytes] = []
+    while True:
+        proxy = write_queue.get()
+        if proxy is None:
+            break
+        batch.append(proxy)
+        if len(batch) >= WRITER_BATCH_SIZE:
+            _flush_batch(batch)
+            batch = []
+    if batch:
+        _flush_batch(batch)
+
+def _merge_batches(out_path: str) -> None:
+    """K-way merges the sorted batch files into the final output file.
+
+    With the Bloom filter active, a run only collects proxies never emitted
+    before, so the previous output file joins the merge and the file stays
+    the cumulative sorted collection across runs rather than being replaced
+    by just the new finds.
+    """
+    merge_inputs = list(_batch_files)
+    if seen_bloom is not None and os.path.exists(out_path):
+        previous = out_path + '.prev'
+        os.replace(out_path, previous)
+        merge_inputs.append(previous)
+    streams = [open(path, 'rb') for path in merge_inputs]
+    try:
+        with open(out_path, 'wb') as out:
+            # Batches are disjoint among themselves, but a rebuilt filter
+            # (first install, deleted or corrupt seen.bloom) re-collects
+            # proxies the previous output already holds, so equal lines can
+            # meet in the merge; skip consecutive duplicates to keep the
+            # output unique.
+            previous_line = None
+            for line in heapq.merge(*streams):
+                if not line.endswith(b'\n'):
+                    line += b'\n'
+                if line != previous_line:
+                    out.write(line)
+                previous_line = line
+    finally:
+        for stream in streams:
+            stream.close()
+        for path in merge_inputs:
+            os.remove(path)
+
+# Shared HTTP session and request gate, created in async_main() once the event
+# loop exists. The semaphore bounds in-flight requests; the connector bounds
+# sockets per host so one host cannot starve the others.
+session: Optional[aiohttp.ClientSession] = None
+request_semaphore: Optional[asyncio.Semaphore] = None
+MAX_IN_FLIGHT = 128
+
+# Transient statuses worth retrying with exponential backoff.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+
+# File downloads bound the connect and per-read times but not the total: a
+# multi-hundred-MB dump legitimately takes minutes to stream, and a total cap
+# would abort it mid-body and silently drop the remainder. Total caps are only
+# right for the small API/GraphQL responses.
+FILE_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=10)
+
+# Regular expression to find proxy candidates in IP:PORT format. Compiled as a
+# bytes pattern so responses are scanned without a Unicode decode pass; proxies
+# are pure ASCII, so matching on raw bytes is equivalent. The pattern is
+# deliberately loose: encoding the 0-255 octet check as alternations forces the
+# backtracking engine through many states per octet, so range validation is
+# done in a batched post-filter instead (see _filter_candidates).
+PROXY_PATTERN = rb'\b(?:\d{1,3}\.){3}\d{1,3}:\d{1,5}\b'
+# re.ASCII pins \b and \d to the ASCII fast path. Bytes patterns already
+# match ASCII-only, so this documents the intent and keeps the fast classes
+# if the pattern ever moves back to str.
+PROXY_REGEX = re.compile(PROXY_PATTERN, re.ASCII)
+
+# Optional NumPy/Numba backend for the post-filter: candidate octets and ports
+# go into one flat array and are validated with a single branchless mask.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import numba
+except ImportError:
+    numba = None
+
+if np is not None and numba is not None:
+    @numba.njit(cache=True)
+    def _candidate_mask(fields):
+        mask = np.empty(fields.shape[0], dtype=np.bool_)
+        for i in range(fields.shape[0]):
+            mask[i] = ((fields[i, 0] < 256) & (fields[i, 1] < 256)
+                       & (fields[i, 2] < 256) & (fields[i, 3] < 256)
+                       & (fields[i, 4] < 65536))
+        return mask
+elif np is not None:
+    def _candidate_mask(fields):
+        return (fields[:, :4] < 256).all(axis=1) & (fields[:, 4] < 65536)
+else:
+    _candidate_mask = None
+
+def _is_valid_candidate(candidate: bytes) -> bool:
+    """Checks one candidate's octet and port ranges."""
+    ip, _, port = candidate.partition(b':')
+    return int(port) < 65536 and all(int(octet) < 256 for octet in ip.split(b'.'))
+
+def _filter_candidates(candidates: Iterable[bytes]) -> Iterable[bytes]:
+    """Drops candidates whose octets exceed 255 or whose port exceeds 65535."""
+    if _candidate_mask is None:
+        # No batch backend: filter lazily so matches flow straight from the
+        # regex into the dedup set without an intermediate list.
+        return filter(_is_valid_candidate, candidates)
+    candidates = list(candidates)  # The batched mask needs one flat array.
+    if not candidates:
+        return candidates
+    fields = np.empty((len(candidates), 5), dtype=np.uint32)
+    for i, candidate in enumerate(candidates):
+        ip, _, port = candidate.partition(b':')
+        fields[i, :4] = [int(octet) for octet in ip.split(b'.')]
+        fields[i, 4] = int(port)
+    mask = _candidate_mask(fields)
+    return [candidate for candidate, ok in zip(candidates, mask) if ok]
+
+# Hyperscan compiles the same pattern to a SIMD-accelerated DFA, which is much
+# faster than the backtracking stdlib engine on bulk scans. It is optional;
+# without it the stdlib regex is used.
+try:
+    import hyperscan
+    _HYPERSCAN_DB = hyperscan.Database()
+    _HYPERSCAN_DB.compile(expressions=[PROXY_PATTERN], flags=[hyperscan.HS_FLAG_SOM_LEFTMOST])
+except ImportError:
+    _HYPERSCAN_DB = None
+
+# File extensions worth downloading from a repo tree. str.endswith accepts a
+# tuple and checks all suffixes in one C call.
+SCAN_EXTENSIONS = ('.txt', '.json', '.xml')
+
+# Blob filters applied on tree metadata, before any download happens. Blobs
+# above the cap are overwhelmingly binary dumps or noise; the floor is the
+# length of the shortest possible proxy line ('0.0.0.0:0'). The denylist
+# drops boilerplate files that carry the scanned extensions but never hold
+# proxies.
+MAX_BLOB_SIZE = 50 * 1024 * 1024
+MIN_BLOB_SIZE = 9
+SKIP_BASENAMES = frozenset({
+    'license.txt', 'readme.txt', 'changelog.txt', 'contributing.txt',
+    'notice.txt', 'authors.txt', 'requirements.txt', 'robots.txt',
+    'cmakelists.txt',
+})
+
+def _should_scan_blob(path: str, size: Optional[int]) -> bool:
+    """Decides from tree metadata whether a blob is worth downloading."""
+    if not path.endswith(SCAN_EXTENSIONS):
+        return False
+    if path.rsplit('/', 1)[-1].lower() in SKIP_BASENAMES:
+        return False
+    if size is not None and not MIN_BLOB_SIZE <= size <= MAX_BLOB_SIZE:
+        return False
+    return True
+
+# Headers for requests to mimic a browser. Compression is advertised
+# explicitly: raw.githubusercontent.com often serves text uncompressed unless
+# asked, and proxy dumps compress 4-10x. Brotli is only offered when the
+# decoder is installed, since aiohttp needs it to decompress 'br' responses.
+try:
+    import brotli  # noqa: F401  (enables aiohttp's brotli decoding)
+    _ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    _ACCEPT_ENCODING = 'gzip, deflate'
 
-# Headers for requests to mimic a browser
 HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Encoding': _ACCEPT_ENCODING,
 }
 
+# Report the negotiated Content-Encoding once so a run shows whether
+# compression actually kicked in.
+_content_encoding_reported = False
+
 # Add GitHub API token for a higher rate limit
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 API_HEADERS = HEADERS.copy()
 if GITHUB_TOKEN:
     API_HEADERS['Authorization'] = f'token {GITHUB_TOKEN}'
 
-def find_proxies_in_text(text: str) -> List[str]:
-    """Finds all proxies in text content using a regular expression."""
-    return PROXY_REGEX.findall(text)
-
-def parse_json_recursively(element: Any, found_proxies: List[str]):
-    """Recursively traverses a JSON structure to find proxies."""
-    if isinstance(element, dict):
-        for value in element.values():
-            parse_json_recursively(value, found_proxies)
-    elif isinstance(element, list):
-        for item in element:
-            parse_json_recursively(item, found_proxies)
-    elif isinstance(element, str):
-        found_proxies.extend(find_proxies_in_text(element))
-
-def parse_xml_recursively(element: ET.Element, found_proxies: List[str]):
-    """Recursively traverses an XML tree to find proxies in text nodes."""
-    if element.text:
-        found_proxies.extend(find_proxies_in_text(element.text))
-    for child in element:
-        parse_xml_recursively(child, found_proxies)
-
-def fetch_and_parse_file(file_url: str, pbar: tqdm) -> List[str]:
-    """Downloads and parses a file to find proxies."""
-    if shutdown_event.is_set():
+# GraphQL returns the default branch and the repository tree in one request,
+# halving API round trips and rate-limit debits versus the two REST calls.
+# GraphQL cannot recurse, so the tree selection is expanded to a fixed depth
+# in the query text; it also requires a token, so REST stays as the fallback.
+GRAPHQL_URL = 'https://api.github.com/graphql'
+TREE_QUERY_DEPTH = 8
+
+# Aliased GraphQL queries let one POST cover many repositories, so a run over
+# a long repo list is bounded by bandwidth rather than request count.
+GRAPHQL_BATCH_SIZE = 30
+
+def _tree_selection(depth: int) -> str:
+    """Builds the nested tree-entries selection expanded to the given depth."""
+    selection = 'entries { path type object { ... on Blob { byteSize } } }'
+    for _ in range(depth - 1):
+        selection = 'entries { path type object { ... on Blob { byteSize } ... on Tree { %s } } }' % selection
+    return selection
+
+def _collect_blob_paths(entries: List[dict], found: List[str]) -> bool:
+    """Flattens a nested GraphQL tree into a list of matching blob paths.
+
+    Walks with an explicit stack instead of recursing, so deep trees cost no
+    Python call frames and cannot hit the recursion limit. Returns False when
+    the payload is truncated by the fixed query depth — a tree entry at the
+    innermost level has no 'entries' selected at all, unlike a genuinely
+    empty directory, which carries an empty list.
+    """
+    complete = True
+    stack = [entries]
+    while stack:
+        for entry in stack.pop():
+            entry_type = entry.get('type')
+            if entry_type == 'blob':
+                path = entry.get('path')
+                if path and _should_scan_blob(path, (entry.get('object') or {}).get('byteSize')):
+                    found.append(path)
+            elif entry_type == 'tree':
+                nested_object = entry.get('object') or {}
+                if 'entries' not in nested_object:
+                    complete = False
+                elif nested_object['entries']:
+                    stack.append(nested_object['entries'])
+    return complete
+
+# On-disk cache of API responses keyed by URL, storing (etag, body). Sending
+# If-None-Match on re-fetch lets GitHub answer 304 without a body, which costs
+# no rate-limit tokens, so repeat runs are nearly free in API quota.
+# Opened in main(): an import-time open would run again in the scan-pool
+# workers under the spawn start method and collide with the parent's writer
+# lock on dbm backends.
+API_CACHE_FILE = 'ghcache.db'
+api_cache: Optional[shelve.Shelf] = None
+
+async def request_with_retries(method: str, url: str, headers: dict, timeout: aiohttp.ClientTimeout,
+                               json_body: Optional[dict] = None) -> aiohttp.ClientResponse:
+    """Sends a request, retrying transient errors with exponential backoff.
+
+    Returns the response unconsumed; the caller is responsible for reading
+    and releasing it.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            if shutdown_event.is_set():
+                raise aiohttp.ClientError("retry abandoned: shutdown requested")
+            await asyncio.sleep(0.3 * (2 ** (attempt - 1)))
+        try:
+            response = await session.request(method, url, headers=headers, json=json_body,
+                                             timeout=timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES:
+                raise
+            continue
+        if response.status in RETRY_STATUSES and attempt < MAX_RETRIES:
+            response.release()
+            continue
+        return response
+
+async def cached_api_get(url: str, timeout: float = 10) -> bytes:
+    """GETs a GitHub API URL with ETag revalidation, returning the body bytes.
+
+    Raises aiohttp.ClientResponseError on HTTP errors.
+    """
+    cached = api_cache.get(url)
+    headers = API_HEADERS
+    if cached:
+        headers = API_HEADERS.copy()
+        headers['If-None-Match'] = cached[0]
+    async with request_semaphore:
+        response = await request_with_retries('GET', url, headers, aiohttp.ClientTimeout(total=timeout))
+        async with response:
+            if cached and response.status == 304:
+                return cached[1]
+            response.raise_for_status()
+            body = await response.read()
+            etag = response.headers.get('ETag')
+            if etag:
+                api_cache[url] = (etag, body)
+            return body
+
+async def graphql_post(query: str, timeout: float = 15) -> dict:
+    """Posts a GraphQL query to the GitHub API and returns the decoded JSON."""
+    async with request_semaphore:
+        response = await request_with_retries('POST', GRAPHQL_URL, API_HEADERS,
+                                              aiohttp.ClientTimeout(total=timeout),
+                                              json_body={'query': query})
+        async with response:
+            response.raise_for_status()
+            return json.loads(await response.read())
+
+def _repository_selection(user: str, repo: str) -> str:
+    """Builds the GraphQL selection for one repository's branch and tree."""
+    return 'repository(owner: %s, name: %s) { defaultBranchRef { name target { ... on Commit { tree { %s } } } } }' % (
+        json.dumps(user), json.dumps(repo), _tree_selection(TREE_QUERY_DEPTH))
+
+def _files_from_repository_payload(repository: Optional[dict], user: str, repo: str,
+                                   pbar: tqdm) -> Optional[List[str]]:
+    """Turns one repository's GraphQL payload into raw file URLs.
+
+    Returns None when the payload is unusable so the caller can fall back.
+    """
+    if not repository:
+        return None
+    branch = repository.get('defaultBranchRef')
+    if not branch:
+        pbar.set_description(f"Could not determine default branch for {user}/{repo}, skipping")
         return []
 
+    paths: List[str] = []
+    tree = (branch.get('target') or {}).get('tree') or {}
+    if not _collect_blob_paths(tree.get('entries') or [], paths):
+        # Blobs deeper than the fixed query depth are missing; the REST
+        # fallback's recursive tree endpoint sees the whole repository.
+        pbar.set_description(f"GraphQL tree for {user}/{repo} truncated, falling back to REST")
+        return None
+    raw_prefix = f"https://raw.githubusercontent.com/{user}/{repo}/{branch['name']}/"
+    return [raw_prefix + path for path in paths]
+
+async def get_files_via_graphql(user: str, repo: str, pbar: tqdm) -> Optional[List[str]]:
+    """Fetches the default branch and file tree in a single GraphQL request.
+
+    Returns None when the call fails so the caller can fall back to REST.
+    """
+    try:
+        data = await graphql_post('query { %s }' % _repository_selection(user, repo))
+    except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+        pbar.set_description(f"GraphQL error for {user}/{repo}: {e}")
+        return None
+    repository = (data.get('data') or {}).get('repository')
+    return _files_from_repository_payload(repository, user, repo, pbar)
+
+async def get_files_batch(repo_urls: List[str], pbar: tqdm) -> dict:
+    """Fetches file lists for a batch of repositories in one aliased query.
+
+    Maps each repo URL to its file list; repos the batch could not resolve
+    map to None so the caller can fall back to the per-repo path.
+    """
+    files_by_url: dict = {repo_url: None for repo_url in repo_urls}
+    targets = {}
+    selections = []
+    for i, repo_url in enumerate(repo_urls):
+        parts = repo_url.strip('/').split('/')
+        if len(parts) < 2:
+            continue  # The per-repo path reports invalid URLs.
+        user, repo = parts[-2], parts[-1]
+        alias = f"r{i}"
+        targets[alias] = (repo_url, user, repo)
+        selections.append(f"{alias}: {_repository_selection(user, repo)}")
+    if not selections:
+        return files_by_url
+
     try:
-        response = session.get(file_url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        content = response.text
-        if file_url.endswith('.json'):
-            proxies: List[str] = []
-            try:
-                json_data = json.loads(content)
-                parse_json_recursively(json_data, proxies)
-                return proxies
-            except json.JSONDecodeError:
-                return find_proxies_in_text(content)
-        elif file_url.endswith('.xml'):
-            proxies = []
-            try:
-                root = ET.fromstring(content)
-                parse_xml_recursively(root, proxies)
-                return proxies
-            except ET.ParseError:
-                return find_proxies_in_text(content)
-        else:  # .txt and other formats
-            return find_proxies_in_text(content)
-    except requests.RequestException as e:
+        data = await graphql_post('query { %s }' % ' '.join(selections), timeout=30)
+    except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+        pbar.set_description(f"GraphQL batch error: {e}")
+        return files_by_url
+
+    payload = data.get('data') or {}
+    for alias, (repo_url, user, repo) in targets.items():
+        files_by_url[repo_url] = _files_from_repository_payload(payload.get(alias), user, repo, pbar)
+    return files_by_url
+
+# Bodies larger than one chunk are scanned incrementally so memory stays
+# O(chunk) rather than O(file). A proxy match is at most 21 bytes (15-byte IP,
+# colon, 5-digit port), so the overlap carried between chunks easily covers
+# one full match split across a boundary.
+STREAM_CHUNK_SIZE = 1 << 20
+STREAM_TAIL = 32
+
+# With downloads keep-alived and compressed, the regex scan is the remaining
+# CPU cost, and on the event-loop thread it would stall all I/O while holding
+# the GIL. Buffers at least this big are scanned in worker processes instead;
+# smaller ones are cheaper to scan inline than to pickle across the process
+# boundary. The pool is created in async_main().
+SCAN_OFFLOAD_THRESHOLD = 256 * 1024
+scan_pool: Optional[ProcessPoolExecutor] = None
+
+def _pin_worker(slot_counter) -> None:
+    """Pins a scan worker to its own core so its caches stay warm across tasks.
+
+    Each worker claims the next slot from a shared counter; PIDs are not
+    consecutive, so deriving slots from them could double up on one core
+    while leaving another idle.
+    """
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return  # Not available outside Linux.
+    with slot_counter.get_lock():
+        slot = slot_counter.value
+        slot_counter.value += 1
+    os.sched_setaffinity(0, {cores[slot % len(cores)]})
+
+def _scan_buffer(buf: bytes) -> List[bytes]:
+    """Scans one whole buffer; runs in a worker process for large buffers."""
+    return list(find_proxies_in_text(buf))
+
+def _scan_window(buf: bytes, lo: int, hi: int) -> List[bytes]:
+    """Scans one stream window, keeping matches whose end lies in [lo, hi)."""
+    return list(_filter_candidates(
+        match.group() for match in PROXY_REGEX.finditer(buf) if lo <= match.end() < hi))
+
+async def _scan_offloaded(func, *args) -> List[bytes]:
+    """Runs a scan function in the process pool, off the event-loop thread."""
+    return await asyncio.get_running_loop().run_in_executor(scan_pool, func, *args)
+
+async def _scan_response_stream(response: aiohttp.ClientResponse) -> None:
+    """Scans a response body chunk by chunk, feeding matches straight into
+    the shared proxy set without materializing the body or a match list.
+
+    Matches touching the end of a window are deferred to the next window,
+    which re-scans a STREAM_TAIL-byte overlap, so a proxy split across a
+    chunk boundary is neither lost nor truncated to a shorter match.
+    """
+    tail = b''
+    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+        if shutdown_event.is_set():
+            # Abandon the rest of the body so Ctrl-C is not stalled behind
+            # multi-hundred-MB downloads; matches so far are already recorded.
+            return
+        buf = tail + chunk
+        # end < len(tail): emitted from the previous window already;
+        # end == len(buf): may continue into the next chunk.
+        if scan_pool is not None and len(buf) >= SCAN_OFFLOAD_THRESHOLD:
+            window = await _scan_offloaded(_scan_window, buf, len(tail), len(buf))
+        else:
+            window = _scan_window(buf, len(tail), len(buf))
+        _record_proxies(_new_proxies(window))
+        tail = buf[-STREAM_TAIL:]
+    # Flush matches deferred at end of stream: exactly those ending at the
+    # tail's end, hence the one-past range.
+    _record_proxies(_new_proxies(_scan_window(tail, len(tail), len(tail) + 1)))
+
+def find_proxies_in_text(text: bytes) -> Iterable[bytes]:
+    """Finds all proxies in raw byte content using a regular expression."""
+    if _HYPERSCAN_DB is not None:
+        found: List[bytes] = []
+
+        def on_match(pattern_id: int, start: int, end: int, flags: int, context: object) -> None:
+            found.append(text[start:end])
+
+        _HYPERSCAN_DB.scan(text, match_event_handler=on_match)
+        return _filter_candidates(found)
+    return _filter_candidates(match.group() for match in PROXY_REGEX.finditer(text))
+
+async def fetch_and_parse_file(file_url: str, pbar: tqdm) -> int:
+    """Downloads a file and feeds its proxies into the shared dedup set.
+
+    Returns the growth of the shared set while this file was processed;
+    with concurrent downloads this is an approximate per-file figure, used
+    only for progress reporting.
+    """
+    if shutdown_event.is_set():
+        return 0
+
+    global _content_encoding_reported
+    before = len(all_proxies)
+    try:
+        async with request_semaphore:
+            response = await request_with_retries('GET', file_url, HEADERS, FILE_TIMEOUT)
+            async with response:
+                response.raise_for_status()
+                if not _content_encoding_reported:
+                    _content_encoding_reported = True
+                    encoding = response.headers.get('Content-Encoding', 'identity')
+                    tqdm.write(f"File downloads use Content-Encoding: {encoding}")
+                # The regex matches IP:PORT literals that JSON/XML structure
+                # cannot split, so scanning the raw bytes covers .json and
+                # .xml files too without building their object trees first.
+                # Small bodies are read whole; anything larger or of unknown
+                # size is scanned as a stream to keep memory flat. A
+                # Content-Encoding response also streams: its Content-Length
+                # is the compressed size, and a small gzip body can inflate
+                # to many times the chunk budget.
+                if (response.content_length is not None
+                        and response.content_length <= STREAM_CHUNK_SIZE
+                        and 'Content-Encoding' not in response.headers):
+                    content = await response.read()
+                    if b':' in content:
+                        if scan_pool is not None and len(content) >= SCAN_OFFLOAD_THRESHOLD:
+                            found = await _scan_offloaded(_scan_buffer, content)
+                        else:
+                            found = find_proxies_in_text(content)
+                        _record_proxies(_new_proxies(found))
+                else:
+                    await _scan_response_stream(response)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         pbar.set_description(f"Error fetching {file_url}: {e}")
-    return []
+    return len(all_proxies) - before
 
-def get_default_branch(user: str, repo: str, pbar: tqdm) -> Optional[str]:
+async def get_default_branch(user: str, repo: str, pbar: tqdm) -> Optional[str]:
     """Gets the default branch name for a repository."""
     api_url = f"https://api.github.com/repos/{user}/{repo}"
     try:
-        response = session.get(api_url, headers=API_HEADERS, timeout=10)
-        response.raise_for_status()
-        repo_info = response.json()
+        repo_info = json.loads(await cached_api_get(api_url))
         return repo_info.get('default_branch')
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         pbar.set_description(f"API error for {user}/{repo}: {e}")
     except json.JSONDecodeError:
         pbar.set_description(f"JSON decode error for {user}/{repo}")
     return None
 
-def get_files_from_repo(repo_url: str, pbar: tqdm) -> List[str]:
+async def get_files_from_repo(repo_url: str, pbar: tqdm) -> List[str]:
     """Gets a list of files to parse from a GitHub repository, determining the default branch."""
     if shutdown_event.is_set():
         return []
@@ -106,7 +597,12 @@ def get_files_from_repo(repo_url: str, pbar: tqdm) -> List[str]:
         return []
     user, repo = parts[-2], parts[-1]
 
-    default_branch = get_default_branch(user, repo, pbar)
+    if GITHUB_TOKEN:
+        files = await get_files_via_graphql(user, repo, pbar)
+        if files is not None:
+            return files
+
+    default_branch = await get_default_branch(user, repo, pbar)
 
     if not default_branch:
         pbar.set_description(f"Could not determine default branch for {user}/{repo}, skipping")
@@ -116,55 +612,102 @@ def get_files_from_repo(repo_url: str, pbar: tqdm) -> List[str]:
 
     files_to_process = []
     try:
-        response = session.get(api_url, headers=API_HEADERS, timeout=15)
-        response.raise_for_status()
-
-        data = response.json()
+        data = json.loads(await cached_api_get(api_url, timeout=15))
         if data.get('truncated'):
              pbar.set_description(f"Warning: File list for {user}/{repo} is truncated")
 
+        raw_prefix = f"https://raw.githubusercontent.com/{user}/{repo}/{default_branch}/"
         for item in data.get('tree', []):
             if shutdown_event.is_set():
                 break
-            if item.get('type') == 'blob' and any(item.get('path','').endswith(ext) for ext in ['.txt', '.json', '.xml']):
-                raw_url = f"https://raw.githubusercontent.com/{user}/{repo}/{default_branch}/{item['path']}"
-                files_to_process.append(raw_url)
-    except requests.RequestException as e:
+            path = item.get('path')
+            if item.get('type') == 'blob' and path and _should_scan_blob(path, item.get('size')):
+                files_to_process.append(raw_prefix + path)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         pbar.set_description(f"API error getting files for {user}/{repo}: {e}")
     except json.JSONDecodeError:
         pbar.set_description(f"JSON decode error for {user}/{repo}")
 
     return files_to_process
 
-def process_repository(repo_url: str, pbar: tqdm) -> Set[str]:
-    """Main function to process a single repository."""
+async def process_repository(repo_url: str, pbar: tqdm,
+                             files: Optional[List[str]] = None) -> None:
+    """Main function to process a single repository.
+
+    `files` may carry a file list prefetched by a batched GraphQL query;
+    when absent, the list is fetched here.
+    """
     if shutdown_event.is_set():
-        return set()
+        return
 
     user, repo = repo_url.strip('/').split('/')[-2:]
     pbar.set_description(f"Scanning {user}/{repo}")
 
-    files = get_files_from_repo(repo_url, pbar)
-    repo_proxies: Set[str] = set()
+    if files is None:
+        files = await get_files_from_repo(repo_url, pbar)
 
     if not files:
         pbar.set_description(f"No files found or skipped in {user}/{repo}")
-        return repo_proxies
+        return
 
+    new_found = 0
     with tqdm(total=len(files), desc=f"Files in {user}/{repo}", leave=False, unit="file") as file_pbar:
-        for file_url in files:
-            if shutdown_event.is_set():
-                break
-            proxies = fetch_and_parse_file(file_url, file_pbar)
-            repo_proxies.update(proxies)
+        tasks = [asyncio.ensure_future(fetch_and_parse_file(file_url, file_pbar)) for file_url in files]
+        for task in asyncio.as_completed(tasks):
+            new_found += await task
             file_pbar.update(1)
 
-    pbar.set_description(f"Finished: {user}/{repo}, found {len(repo_proxies)} proxies")
-    return repo_proxies
+    pbar.set_description(f"Finished: {user}/{repo}, {new_found} new proxies, {len(all_proxies)} unique total")
+
+async def async_main(repo_urls: List[str]) -> None:
+    """Runs the scrape over all repositories on a single event loop."""
+    global session, request_semaphore, scan_pool
+    request_semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
+    pin_counter = multiprocessing.Value('i', 0)
+    scan_pool = ProcessPoolExecutor(max_workers=os.cpu_count(),
+                                    initializer=_pin_worker, initargs=(pin_counter,))
+
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, shutdown_event.set)
+    except NotImplementedError:
+        pass  # Not available on Windows; main() falls back to KeyboardInterrupt.
+
+    connector = aiohttp.TCPConnector(limit=MAX_IN_FLIGHT, limit_per_host=32, keepalive_timeout=60)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as http_session:
+            session = http_session
+            with tqdm(total=len(repo_urls), desc="Overall Progress", unit="repo") as pbar:
+
+                async def run_one(repo_url: str, files: Optional[List[str]] = None) -> None:
+                    try:
+                        await process_repository(repo_url, pbar, files)
+                    except Exception as e:
+                        pbar.set_description(f"Error processing {repo_url}: {e}")
+                    finally:
+                        pbar.update(1)
+
+                if GITHUB_TOKEN:
+                    # One aliased GraphQL query covers a whole chunk of repos.
+                    async def run_chunk(chunk: List[str]) -> None:
+                        files_by_url = await get_files_batch(chunk, pbar)
+                        await asyncio.gather(*(run_one(url, files_by_url.get(url)) for url in chunk))
+
+                    chunks = [repo_urls[i:i + GRAPHQL_BATCH_SIZE]
+                              for i in range(0, len(repo_urls), GRAPHQL_BATCH_SIZE)]
+                    await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+                else:
+                    await asyncio.gather(*(run_one(url) for url in repo_urls))
+    finally:
+        scan_pool.shutdown()
+        scan_pool = None
 
 def main():
     """Main function to run the proxy scraper."""
-    all_proxies: Set[str] = set()
+    global api_cache
+    api_cache = shelve.open(API_CACHE_FILE)
+    writer = threading.Thread(target=writer_loop, daemon=True)
+    writer.start()
     try:
         if not os.path.exists('repositories.txt'):
             print("Error: 'repositories.txt' not found.")
@@ -184,38 +727,31 @@ def main():
             print("See: https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/creating-a-personal-access-token")
         print("Press Ctrl+C to stop.")
 
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            with tqdm(total=len(repo_urls), desc="Overall Progress", unit="repo") as pbar:
-                future_to_url = {executor.submit(process_repository, url, pbar): url for url in repo_urls}
+        asyncio.run(async_main(repo_urls))
 
-                for future in as_completed(future_to_url):
-                    if shutdown_event.is_set():
-                        for f in future_to_url:
-                            f.cancel()
-                        break
-                    try:
-                        result = future.result()
-                        all_proxies.update(result)
-                        pbar.update(1)
-                    except Exception as e:
-                        url = future_to_url[future]
-                        pbar.set_description(f"Error processing {url}: {e}")
-                        pbar.update(1)
+        if shutdown_event.is_set():
+            print("\n\nUser requested interruption. Shutting down...")
 
     except KeyboardInterrupt:
         print("\n\nUser requested interruption. Shutting down...")
         shutdown_event.set()
     finally:
+        api_cache.close()
+        write_queue.put(None)
+        writer.join()
         if all_proxies:
             print(f"\nCollection complete. Found {len(all_proxies)} unique proxies.")
             print("Saving to 'proxies_output.txt'...")
-            sorted_proxies = sorted(list(all_proxies))
-            with open('proxies_output.txt', 'w') as f:
-                for proxy in sorted_proxies:
-                    f.write(proxy + '\n')
+            _merge_batches('proxies_output.txt')
             print("Proxies saved successfully.")
         elif not shutdown_event.is_set():
             print("\nNo proxies found.")
+        # Persist the filter only after the merge has landed: saving earlier
+        # would mark this run's proxies as seen even when the merge failed,
+        # permanently dropping them from the output of every later run.
+        if seen_bloom is not None:
+            with open(BLOOM_FILE, 'wb') as f:
+                seen_bloom.tofile(f)
 
 if __name__ == "__main__":
     main()